@@ -1,15 +1,29 @@
-from flask import Flask, request, jsonify, abort
-from decimal import Decimal
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, Response
 import pyodbc
 import os
-import requests
+import asyncio
+import aiohttp
+import orjson
+import uvicorn
 import re
-import schedule
+import gzip
 import time
-from threading import Thread
+import queue
 from datetime import datetime
+from functools import lru_cache, partial
+from contextlib import asynccontextmanager, contextmanager
+from typing import Optional
 
-app = Flask(__name__)
+@asynccontextmanager
+async def lifespan(app):
+    """Arranca las tareas de fondo con el servidor y las detiene al apagarlo."""
+    await start_background_jobs()
+    yield
+    await stop_background_jobs()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # ------------------ Configuración SQL Server ------------------
 sql_host = os.environ.get('SQLSERVER_HOST')
@@ -33,122 +47,437 @@ conn_str = (
     "Encrypt=no;TrustServerCertificate=yes;"
 )
 
+# ------------------ Pool de conexiones SQL Server ---------------
+# Tamaño pensado para workers x threads del servidor (ej. 2 x 4 = 8).
+# Los lugares arrancan vacíos (None) y se conectan en el primer uso.
+SQL_POOL_SIZE = int(os.environ.get('SQL_POOL_SIZE', '8'))
+# Segundos que una búsqueda espera un lugar libre en el pool antes de fallar
+SQL_POOL_TIMEOUT = float(os.environ.get('SQL_POOL_TIMEOUT', '10'))
+# Timeout de cada consulta (segundos): una consulta colgada no retiene el lugar
+SQL_QUERY_TIMEOUT = int(os.environ.get('SQL_QUERY_TIMEOUT', '30'))
+_sql_pool = queue.LifoQueue()
+for _ in range(SQL_POOL_SIZE):
+    _sql_pool.put(None)
+
+
+# SQLSTATE de errores de conexión (enlace caído, no se pudo conectar, etc.)
+_CONNECTION_SQLSTATES = ('08S01', '08001', '08003', '08007')
+
+
+def _is_connection_error(e):
+    """True si el error indica que la conexión ya no sirve."""
+    if isinstance(e, pyodbc.OperationalError):
+        return True
+    return isinstance(e, pyodbc.Error) and bool(e.args) and e.args[0] in _CONNECTION_SQLSTATES
+
+
+@contextmanager
+def _pooled_connection(timeout=5):
+    """Presta una conexión del pool; la descarta sólo si falló la conexión."""
+    try:
+        conn = _sql_pool.get(timeout=SQL_POOL_TIMEOUT)
+    except queue.Empty:
+        raise RuntimeError("No hay conexiones SQL Server disponibles.") from None
+    try:
+        if conn is None:
+            conn = pyodbc.connect(conn_str, timeout=timeout, autocommit=True)
+            conn.timeout = SQL_QUERY_TIMEOUT
+        yield conn
+    except pyodbc.Error as e:
+        # Errores de la consulta (sintaxis, etc.) dejan la conexión sana en el pool;
+        # si se cayó el enlace, se cierra y el lugar queda libre
+        if conn is not None and _is_connection_error(e):
+            try:
+                conn.close()
+            except pyodbc.Error:
+                pass
+            conn = None
+        raise
+    finally:
+        _sql_pool.put(conn)
+
 # ==============================================================
 # Utilitarios
 # ==============================================================
 
+_TRANS = str.maketrans('áéíóúñü', 'aeiounu')
+_WS_RE = re.compile(r'\s+')
+# Palabras de 3+ caracteres: el largo mínimo lo filtra el propio regex
+_KW_RE = re.compile(r'\b\w{3,}\b')
+_STOP_WORDS = frozenset({'de', 'la', 'el', 'en', 'con', 'para', 'por', 'un', 'una', 'y', 'o', 'del', 'las', 'los'})
+
+
+@lru_cache(maxsize=131072)
 def normalize_text(text):
     """Normaliza texto para mejorar búsquedas."""
     if not text:
         return ""
-    text = text.lower()
-    replacements = {
-        'á': 'a', 'é': 'e', 'í': 'i', 'ó': 'o', 'ú': 'u',
-        'ñ': 'n', 'ü': 'u'
-    }
-    for old, new in replacements.items():
-        text = text.replace(old, new)
-    text = re.sub(r'\s+', ' ', text).strip()
-    return text
+    return _WS_RE.sub(' ', text.lower().translate(_TRANS)).strip()
+
+
+@lru_cache(maxsize=131072)
+def _extract_keywords_cached(description):
+    extended_keywords = set()
+    add = extended_keywords.add
+    for word in _KW_RE.findall(normalize_text(description)):
+        if word in _STOP_WORDS:
+            continue
+        add(word)
+        if word.endswith('s') and len(word) > 3:
+            add(word[:-1])   # singular
+        else:
+            add(word + 's')  # plural
+    return tuple(extended_keywords)
 
 
 def extract_keywords(description):
     """Extrae palabras clave de la descripción."""
     if not description:
         return []
-    stop_words = {'de', 'la', 'el', 'en', 'con', 'para', 'por', 'un', 'una', 'y', 'o', 'del', 'las', 'los'}
-    words = re.findall(r'\b\w+\b', normalize_text(description))
-    keywords = [w for w in words if len(w) > 2 and w not in stop_words]
-
-    extended_keywords = set(keywords)
-    for word in keywords:
-        if word.endswith('s') and len(word) > 3:
-            extended_keywords.add(word[:-1])   # singular
-        else:
-            extended_keywords.add(word + 's')  # plural
-    return list(extended_keywords)
+    # Copia nueva en cada llamada: la tupla cacheada se comparte entre productos
+    return list(_extract_keywords_cached(description))
 
 
 # ==============================================================
 # Sincronización SQL Server -> Supabase
 # ==============================================================
 
-def sync_catalog_to_supabase():
-    """Sincroniza el catálogo completo desde SQL Server a Supabase."""
+BATCH_SIZE = 1000
+# Lotes en vuelo a la vez contra Supabase (upserts y borrados)
+SYNC_CONCURRENCY = int(os.environ.get('SYNC_CONCURRENCY', '8'))
+# Códigos por DELETE: la lista viaja en la URL, así que va en tandas más chicas
+DELETE_CHUNK = 200
+# Si los códigos a borrar superan esta fracción de lo cargado en Supabase se
+# asume un error (ej. códigos que no coinciden) y no se borra nada. Para
+# aplicar una baja grande legítima, subirlo (MAX_STALE_FRACTION=1 no limita).
+MAX_STALE_FRACTION = float(os.environ.get('MAX_STALE_FRACTION', '0.2'))
+# Conexiones HTTP abiertas hacia Supabase (keep-alive, compartidas por la sesión):
+# una por lote en vuelo, así ningún lote espera conexión libre
+HTTP_POOL_SIZE = SYNC_CONCURRENCY
+# Reintentos ante errores transitorios del gateway; todos los requests son idempotentes
+RETRY_STATUSES = (502, 503, 504)
+MAX_RETRIES = 3
+RETRY_BACKOFF = 0.3
+# Cuerpos de upsert comprimidos con gzip (JSON muy repetitivo). Opcional
+# (SUPABASE_GZIP=1): activarlo sólo si el gateway de Supabase acepta
+# Content-Encoding: gzip en el request; si no, todos los upserts fallan.
+SUPABASE_GZIP = os.environ.get('SUPABASE_GZIP', '0') == '1'
+
+
+# PrecioFinal se castea a float en la consulta: el driver entrega floats
+# directamente y no se construye un Decimal por fila.
+# descripcion_normalizada es una columna calculada persistida
+# (ver sql/01_consstock_descripcion_normalizada.sql). RV es la columna
+# rowversion de sql/02_consstock_rowversion.sql: sólo se leen las filas
+# modificadas desde la última sincronización exitosa. Ambas consultas se
+# resuelven con el índice filtrado de sql/04_consstock_sync_index.sql.
+SYNC_QUERY = """
+    SELECT Codigo, Descri, descripcion_normalizada, CAST(PrecioFinal AS float) AS PrecioFinal
+    FROM dbo.ConsStock
+    WHERE RV >= CAST(CAST(? AS bigint) AS binary(8)) AND PrecioFinal > 0
+    ORDER BY Codigo
+"""
+
+# Filas con RV >= a esta marca pueden no estar commiteadas todavía; se
+# toma antes de leer y la próxima corrida arranca desde acá.
+SYNC_MARK_QUERY = "SELECT CAST(MIN_ACTIVE_ROWVERSION() AS bigint)"
+
+SYNC_CODES_QUERY = """
+    SELECT Codigo
+    FROM dbo.ConsStock
+    WHERE PrecioFinal > 0
+"""
+
+# Reenvío de productos que faltan en Supabase, de a SYNC_MISSING_CHUNK códigos
+# (SQL Server admite hasta 2100 parámetros por consulta)
+SYNC_MISSING_QUERY = """
+    SELECT Codigo, Descri, descripcion_normalizada, CAST(PrecioFinal AS float) AS PrecioFinal
+    FROM dbo.ConsStock
+    WHERE Codigo IN ({placeholders}) AND PrecioFinal > 0
+    ORDER BY Codigo
+"""
+SYNC_MISSING_CHUNK = 1000
+
+SYNC_STATE_ID = 'productos_catalogo'
+
+
+def _build_product(row, updated_at):
+    """Arma el registro de Supabase para una fila de dbo.ConsStock."""
+    codigo, descri, normalized_desc, precio = row
+    return {
+        'codigo': codigo,
+        'descripcion': descri,
+        'descripcion_normalizada': normalized_desc or "",
+        'precio_final': precio or 0,
+        'keywords': extract_keywords(normalized_desc),
+        'updated_at': updated_at
+    }
+
+
+def _read_batch(cursor, updated_at):
+    """Trae y arma el próximo lote (bloqueante, corre en un executor)."""
+    return [_build_product(row, updated_at) for row in cursor.fetchmany(BATCH_SIZE)]
+
+
+async def _fetch_batches(cursor, updated_at):
+    """Lee el resultado de a BATCH_SIZE filas sin materializar todo el catálogo.
+
+    La lectura y la normalización corren fuera del loop para no frenar la API.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = await loop.run_in_executor(None, _read_batch, cursor, updated_at)
+        if not batch:
+            break
+        yield batch
+
+
+async def _request(session, method, url, **kwargs):
+    """Request a Supabase con reintentos (backoff exponencial) ante fallas transitorias."""
+    for attempt in range(MAX_RETRIES + 1):
+        last_attempt = attempt == MAX_RETRIES
+        try:
+            response = await session.request(method, url, **kwargs)
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            if last_attempt:
+                raise
+        else:
+            if response.status not in RETRY_STATUSES or last_attempt:
+                return response
+            response.release()
+        await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt)
+
+
+def _encode_batch(batch):
+    """Serializa un lote a JSON y, si corresponde, lo comprime (corre en un executor)."""
+    body = orjson.dumps(batch)
+    if SUPABASE_GZIP:
+        # Nivel 1: casi la misma reducción que el default, con mucho menos CPU
+        return gzip.compress(body, compresslevel=1), {'Content-Encoding': 'gzip'}
+    return body, {}
+
+
+async def _upsert_batch(session, sem, url, batch, number):
+    """Sube (UPSERT) un lote a Supabase; devuelve la cantidad o None si falla.
+
+    El semáforo lo adquiere quien crea la tarea y se libera acá al terminar.
+    """
+    try:
+        body, headers = await asyncio.get_running_loop().run_in_executor(None, _encode_batch, batch)
+        async with await _request(session, 'POST', url, data=body, headers=headers) as response:
+            if response.status in (200, 201, 204):
+                print(f"Lote {number}: {len(batch)} productos actualizados.")
+                return len(batch)
+            text = (await response.text()).translate(_TRANS)
+            print(f"Error en lote {number}: {response.status} {text}")
+            return None
+    finally:
+        sem.release()
+
+
+async def _upsert_query(session, url, cursor, updated_at, query, *params):
+    """Ejecuta una consulta de productos y sube el resultado por lotes.
+
+    Devuelve (filas leídas, productos subidos, lotes con error).
+    """
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, partial(cursor.execute, query, *params))
+
+    # ----- Leer y subir en paralelo, hasta SYNC_CONCURRENCY lotes en vuelo -----
+    # Adquirir el semáforo antes de leer el lote siguiente limita la memoria
+    # a SYNC_CONCURRENCY lotes, sin importar el tamaño del catálogo.
+    sem = asyncio.Semaphore(SYNC_CONCURRENCY)
+    tasks = []
+    read = 0
+    try:
+        async for batch in _fetch_batches(cursor, updated_at):
+            read += len(batch)
+            await sem.acquire()
+            tasks.append(asyncio.ensure_future(
+                _upsert_batch(session, sem, url, batch, len(tasks) + 1)
+            ))
+    finally:
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+
+    upserted = 0
+    failed = 0
+    for result in results:
+        if isinstance(result, BaseException):
+            print("Error en lote:", str(result).translate(_TRANS))
+            failed += 1
+        elif result is None:
+            failed += 1
+        else:
+            upserted += result
+    return read, upserted, failed
+
+
+async def _get_last_rv(session):
+    """Lee de Supabase la marca rowversion de la última sincronización (0 si no hay)."""
+    params = {'select': 'last_rv', 'id': f'eq.{SYNC_STATE_ID}'}
+    async with await _request(session, 'GET', f"{SUPABASE_URL}/rest/v1/sync_state", params=params) as response:
+        if response.status != 200:
+            raise RuntimeError(f"Error leyendo sync_state: {response.status} {await response.text()}")
+        rows = await response.json(loads=orjson.loads)
+    return rows[0]['last_rv'] if rows else 0
+
+
+async def _save_last_rv(session, last_rv, updated_at):
+    """Guarda (UPSERT) la marca rowversion para la próxima sincronización."""
+    state = {'id': SYNC_STATE_ID, 'last_rv': last_rv, 'updated_at': updated_at}
+    url = f"{SUPABASE_URL}/rest/v1/sync_state?on_conflict=id"
+    async with await _request(session, 'POST', url, data=orjson.dumps(state)) as response:
+        if response.status not in (200, 201, 204):
+            raise RuntimeError(f"Error guardando sync_state: {response.status} {await response.text()}")
+
+
+def _read_codes(cursor):
+    """Códigos vigentes en SQL Server (bloqueante, corre en un executor)."""
+    cursor.execute(SYNC_CODES_QUERY)
+    return {str(row[0]) for row in cursor.fetchall()}
+
+
+async def _fetch_remote_codes(session, url):
+    """Devuelve el conjunto de códigos cargados hoy en Supabase (paginado).
+
+    Se pagina hasta recibir una página vacía: si el db-max-rows de PostgREST es
+    menor que BATCH_SIZE, una página corta no significa que no haya más.
+    """
+    codes = set()
+    offset = 0
+    while True:
+        params = {'select': 'codigo', 'order': 'codigo', 'limit': str(BATCH_SIZE), 'offset': str(offset)}
+        async with await _request(session, 'GET', url, params=params) as response:
+            if response.status != 200:
+                raise RuntimeError(f"Error leyendo codigos Supabase: {response.status} {await response.text()}")
+            page = await response.json(loads=orjson.loads)
+        if not page:
+            return codes
+        codes.update(str(row['codigo']) for row in page)
+        offset += len(page)
+
+
+def _in_filter(codes):
+    """Arma un filtro PostgREST `in.(...)` con los valores entre comillas."""
+    quoted = ('"' + c.replace('\\', '\\\\').replace('"', '\\"') + '"' for c in codes)
+    return 'in.(' + ','.join(quoted) + ')'
+
+
+async def _delete_chunk(session, sem, url, chunk):
+    """Borra un grupo de códigos; devuelve la cantidad o None si falla."""
+    async with sem:
+        async with await _request(session, 'DELETE', url, params={'codigo': _in_filter(chunk)}) as response:
+            if response.status in (200, 204):
+                return len(chunk)
+            text = (await response.text()).translate(_TRANS)
+            print(f"Error borrando registros Supabase: {response.status} {text}")
+            return None
+
+
+async def _delete_stale(session, url, stale_codes):
+    """Borra de Supabase los códigos que ya no están en SQL Server."""
+    stale_codes = sorted(stale_codes)
+    sem = asyncio.Semaphore(SYNC_CONCURRENCY)
+    results = await asyncio.gather(*[
+        _delete_chunk(session, sem, url, stale_codes[i:i + DELETE_CHUNK])
+        for i in range(0, len(stale_codes), DELETE_CHUNK)
+    ])
+    if None in results:
+        return False
+    print(f"Productos eliminados de Supabase: {sum(results)}")
+    return True
+
+
+async def sync_catalog_to_supabase():
+    """Sincroniza el catálogo desde SQL Server a Supabase (sólo filas modificadas)."""
+    global _CACHE_EPOCH
     if not SUPABASE_URL or not SUPABASE_KEY:
         print("Supabase no configurado, saltando sincronizacion.")
         return False
 
     try:
-        print(f"Iniciando sincronizacion del catalogo - {datetime.now()}")
-
-        # ----- Leer productos desde SQL Server -----
-        with pyodbc.connect(conn_str, timeout=30) as conn:
-            cursor = conn.cursor()
-            query = """
-                SELECT Codigo, Descri, PrecioFinal
-                FROM dbo.ConsStock
-                WHERE PrecioFinal > 0
-                ORDER BY Codigo
-            """
-            cursor.execute(query)
-
-            products = []
-            for row in cursor.fetchall():
-                codigo, descri, precio = row
-                keywords = extract_keywords(descri)
-                normalized_desc = normalize_text(descri)
-                product = {
-                    'codigo': codigo,
-                    'descripcion': descri,
-                    'descripcion_normalizada': normalized_desc,
-                    'precio_final': float(precio) if precio else 0,
-                    'keywords': keywords,
-                    'updated_at': datetime.now().isoformat()
-                }
-                products.append(product)
-
-        print(f"Productos leidos desde SQL Server: {len(products)}")
+        started = datetime.now()
+        print(f"Iniciando sincronizacion del catalogo - {started}")
+        # Mismo sello de tiempo para todos los productos de esta sincronización
+        updated_at = started.isoformat()
 
         # ----- Preparar headers Supabase -----
+        # UPSERT por codigo: no hace falta vaciar la tabla antes de cargar
         headers = {
             'apikey': SUPABASE_KEY,
             'Authorization': f'Bearer {SUPABASE_KEY}',
             'Content-Type': 'application/json',
-            'Prefer': 'resolution=merge-duplicates'
+            'Prefer': 'resolution=merge-duplicates,return=minimal'
         }
-
-        # ----- Borrar tabla existente (todos los registros) -----
-        delete_url = f"{SUPABASE_URL}/rest/v1/productos_catalogo"
-        # Filtro amplio: borra todo donde codigo no sea null (debería ser todos)
-        delete_resp = requests.delete(delete_url, headers=headers, params={'codigo': 'not.is.null'})
-        if delete_resp.status_code not in (200, 204):
-            print(f"Error borrando registros Supabase: {delete_resp.status_code} {delete_resp.text}")
-
-        # ----- Insertar por lotes -----
-        batch_size = 1000
-        total_inserted = 0
-        insert_url = f"{SUPABASE_URL}/rest/v1/productos_catalogo"
-
-        for i in range(0, len(products), batch_size):
-            batch = products[i:i + batch_size]
-            response = requests.post(insert_url, headers=headers, json=batch)
-            if response.status_code in (200, 201, 204):
-                total_inserted += len(batch)
-                print(f"Lote {i // batch_size + 1}: {len(batch)} productos insertados.")
-            else:
-                print(f"Error en lote {i // batch_size + 1}: {response.status_code} {response.text}")
+        table_url = f"{SUPABASE_URL}/rest/v1/productos_catalogo"
+        upsert_url = f"{table_url}?on_conflict=codigo"
+
+        # Una sola sesión para todos los requests (reutiliza conexiones TCP/TLS)
+        connector = aiohttp.TCPConnector(limit=HTTP_POOL_SIZE)
+        async with aiohttp.ClientSession(headers=headers, connector=connector) as session:
+            last_rv = await _get_last_rv(session)
+
+            # ----- Abrir consulta en SQL Server (pyodbc es bloqueante) -----
+            loop = asyncio.get_running_loop()
+            conn = await loop.run_in_executor(None, partial(pyodbc.connect, conn_str, timeout=30))
+            try:
+                cursor = conn.cursor()
+                cursor.arraysize = BATCH_SIZE
+                await loop.run_in_executor(None, cursor.execute, SYNC_MARK_QUERY)
+                next_rv = await loop.run_in_executor(None, cursor.fetchval)
+
+                changed, total_inserted, failed = await _upsert_query(
+                    session, upsert_url, cursor, updated_at, SYNC_QUERY, last_rv
+                )
+                seen_codes = await loop.run_in_executor(None, _read_codes, cursor)
+                print(f"Productos modificados en SQL Server: {changed} de {len(seen_codes)}")
+
+                if failed:
+                    print(f"Sincronizacion incompleta - {failed} lotes con error, {total_inserted} productos actualizados.")
+                    return False
+
+                remote_codes = await _fetch_remote_codes(session, table_url)
+
+                # ----- Productos en SQL Server que faltan en Supabase -----
+                # Su RV quedó por debajo de la marca (tabla truncada/restaurada, borrados
+                # manuales): la consulta incremental no los trae, se reenvían por código.
+                missing_codes = sorted(seen_codes - remote_codes)
+                if missing_codes:
+                    print(f"Faltan {len(missing_codes)} productos en Supabase, reenviando.")
+                for i in range(0, len(missing_codes), SYNC_MISSING_CHUNK):
+                    chunk = missing_codes[i:i + SYNC_MISSING_CHUNK]
+                    query = SYNC_MISSING_QUERY.format(placeholders=','.join('?' * len(chunk)))
+                    _, resent, failed = await _upsert_query(
+                        session, upsert_url, cursor, updated_at, query, *chunk
+                    )
+                    total_inserted += resent
+                    if failed:
+                        print(f"Sincronizacion incompleta - {failed} lotes con error reenviando faltantes.")
+                        return False
+            finally:
+                conn.close()
+
+            # Los upserts están completos: la marca avanza aunque el borrado no se
+            # haga, porque los eliminados se recalculan comparando todo en cada corrida
+            await _save_last_rv(session, next_rv, updated_at)
+
+            # ----- Borrar sólo lo que ya no existe en SQL Server -----
+            stale_codes = remote_codes - seen_codes
+            if len(stale_codes) > MAX_STALE_FRACTION * len(remote_codes):
+                print(f"Borrado cancelado: {len(stale_codes)} de {len(remote_codes)} productos "
+                      f"figuran como eliminados (limite MAX_STALE_FRACTION={MAX_STALE_FRACTION}), "
+                      f"revisar los codigos.")
+                return False
+            if stale_codes and not await _delete_stale(session, table_url, stale_codes):
                 return False
 
+        _CACHE_EPOCH += 1
         print(f"Sincronizacion completada - {total_inserted} productos actualizados.")
         return True
 
     except Exception as e:
         # Evitamos caracteres raros en logs
-        msg = str(e)
-        for a, b in (('ó', 'o'), ('í', 'i'), ('á', 'a'), ('é', 'e'), ('ú', 'u')):
-            msg = msg.replace(a, b)
-        print("Error en sincronizacion:", msg)
+        print("Error en sincronizacion:", str(e).translate(_TRANS))
         return False
 
 
@@ -156,94 +485,169 @@ def sync_catalog_to_supabase():
 # API
 # ==============================================================
 
-@app.route("/search-multi", methods=["GET"])
-def search_multi():
+# Palabras más cortas que esto quedan por debajo de lo que indexa full-text
+FULLTEXT_MIN_LEN = 3
+# Sólo palabras (letras/dígitos) separadas por un espacio: cualquier otra cosa
+# (medidas como 1/2 o 3/4, guiones, comillas) el word breaker la parte en
+# tokens que no matchean como LIKE '%term%'
+_FULLTEXT_TERM_RE = re.compile(r'[^\W_]+(?: [^\W_]+)*')
+
+
+def _is_fulltext_term(term):
+    """True si el término puede ir a CONTAINS sin cambiar lo que encuentra."""
+    return (_FULLTEXT_TERM_RE.fullmatch(term) is not None
+            and all(len(word) >= FULLTEXT_MIN_LEN for word in term.split(' ')))
+
+
+def _search_condition(terms):
+    """Arma el WHERE de búsqueda: CONTAINS con prefijos para palabras y LIKE para el resto."""
+    prefix_terms = []
+    like_terms = []
+    for term in terms:
+        cleaned = ' '.join(term.split())
+        if _is_fulltext_term(cleaned):
+            prefix_terms.append(f'"{cleaned}*"')
+        else:
+            like_terms.append(term)
+
+    clauses = []
+    params = []
+    if prefix_terms:
+        clauses.append("CONTAINS(Descri, ?)")
+        params.append(" OR ".join(prefix_terms))
+    for term in like_terms:
+        clauses.append("Descri LIKE ?")
+        params.append(f"%{term}%")
+    return " OR ".join(clauses), params
+
+
+def _search(terms):
+    """Consulta bloqueante contra SQL Server (corre en un executor)."""
+    condition, params = _search_condition(terms)
+
+    # Requiere el índice full-text de sql/03_consstock_fulltext.sql
+    query = f"""
+        SELECT TOP 200 Codigo, Descri, CAST(PrecioFinal AS float) AS PrecioFinal
+        FROM dbo.ConsStock
+        WHERE ({condition}) AND PrecioFinal > 0
+        ORDER BY PrecioFinal ASC
+    """
+    for attempt in range(2):
+        try:
+            with _pooled_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(query, params)
+                rows = cursor.fetchall()
+            break
+        except pyodbc.Error as e:
+            # Una conexión del pool que quedó muerta (corte por inactividad, reinicio
+            # del server) ya fue descartada: se reintenta una vez con una nueva
+            if attempt or not _is_connection_error(e):
+                raise
+
+    results = [
+        {'Codigo': codigo, 'Descri': descri, 'PrecioFinal': precio}
+        for codigo, descri, precio in rows
+    ]
+
+    return {"total": len(results), "results": results}
+
+
+# Vigencia de las respuestas cacheadas de /search-multi (segundos). La búsqueda
+# lee dbo.ConsStock en vivo, así que esto acota cuánto puede atrasar un precio.
+# SEARCH_CACHE_TTL=0 (o negativo) desactiva el cache.
+SEARCH_CACHE_TTL = int(os.environ.get('SEARCH_CACHE_TTL', '300'))
+
+# Se incrementa con cada sincronización exitosa: invalidación extra del cache
+_CACHE_EPOCH = 0
+
+
+def _search_json(terms):
+    """Respuesta de _search ya serializada."""
+    return orjson.dumps(_search(terms))
+
+
+@lru_cache(maxsize=2048)
+def _search_cached(epoch, terms):
+    """_search_json cacheado; `epoch` sólo forma parte de la clave."""
+    return _search_json(terms)
+
+
+def _search_epoch():
+    """Clave de vigencia del cache: cambia cada SEARCH_CACHE_TTL segundos o tras una sync."""
+    return _CACHE_EPOCH, int(time.monotonic() // SEARCH_CACHE_TTL)
+
+
+@app.get("/search-multi")
+async def search_multi(token: Optional[str] = None, query: str = ""):
     """Endpoint de búsqueda multi-términos."""
-    token = request.args.get("token")
     if token != os.environ.get("API_TOKEN"):
-        return abort(403, "Unauthorized")
+        raise HTTPException(status_code=403, detail="Unauthorized")
 
-    query_param = request.args.get("query", "").strip()
+    query_param = query.strip()
     if not query_param:
-        return jsonify({"error": "Query parameter is required."}), 400
+        return JSONResponse({"error": "Query parameter is required."}, status_code=400)
 
     terms = [t.strip() for t in query_param.split(",") if t.strip()]
     if not terms:
-        return jsonify({"error": "No valid terms provided."}), 400
+        return JSONResponse({"error": "No valid terms provided."}, status_code=400)
 
     try:
-        with pyodbc.connect(conn_str, timeout=5) as conn:
-            cursor = conn.cursor()
-            like_clauses = " OR ".join(["Descri LIKE ?" for _ in terms])
-            params = [f"%{t}%" for t in terms]
-
-            query = f"""
-                SELECT TOP 200 Codigo, Descri, PrecioFinal
-                FROM dbo.ConsStock
-                WHERE {like_clauses} AND PrecioFinal > 0
-                ORDER BY PrecioFinal ASC
-            """
-            cursor.execute(query, params)
-            columns = [c[0] for c in cursor.description]
-
-            results = []
-            for row in cursor.fetchall():
-                record = dict(zip(columns, row))
-                for key, value in record.items():
-                    if isinstance(value, Decimal):
-                        record[key] = float(value)
-                results.append(record)
-
-            return jsonify({"total": len(results), "results": results})
-
+        loop = asyncio.get_running_loop()
+        # El orden y los repetidos no cambian el resultado: misma entrada de cache
+        key = tuple(sorted(set(terms)))
+        if SEARCH_CACHE_TTL > 0:
+            body = await loop.run_in_executor(None, _search_cached, _search_epoch(), key)
+        else:
+            body = await loop.run_in_executor(None, _search_json, key)
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+    return Response(content=body, media_type="application/json")
 
 
 # ==============================================================
-# Scheduler
+# Sincronización periódica (tarea asyncio en el loop del servidor)
 # ==============================================================
 
-def run_scheduler():
-    """Ejecuta el scheduler para sincronizacion automatica cada 8 horas."""
-    if not SUPABASE_URL or not SUPABASE_KEY:
-        print("Scheduler deshabilitado - Supabase no configurado.")
-        return
+SYNC_INTERVAL_SECONDS = 8 * 3600
 
-    schedule.every(8).hours.do(sync_catalog_to_supabase)
-    print("Scheduler iniciado (cada 8 horas).")
+# Opt-in: cada proceso con RUN_BACKGROUND_JOBS=1 corre su propia sincronización,
+# así que con varios workers (uvicorn --workers N) o instancias hay que
+# activarlo sólo en un proceso dedicado.
+RUN_BACKGROUND_JOBS = os.environ.get('RUN_BACKGROUND_JOBS') == '1'
 
-    while True:
-        schedule.run_pending()
-        time.sleep(60)
+_background_tasks = []
 
 
-# ==============================================================
-# Lanzar hilos al importar el módulo (Render/Gunicorn/etc.)
-# ==============================================================
+async def _periodic_sync():
+    """Sincroniza al arrancar y después cada SYNC_INTERVAL_SECONDS."""
+    print("Ejecutando sincronizacion inicial...")
+    await sync_catalog_to_supabase()
 
-def run_sync_in_thread():
-    try:
-        print("Ejecutando sincronizacion inicial...")
-        sync_catalog_to_supabase()
-    except Exception as e:
-        print("Error ejecutando sincronizacion inicial:", str(e))
+    print("Scheduler iniciado (cada 8 horas).")
+    while True:
+        await asyncio.sleep(SYNC_INTERVAL_SECONDS)
+        await sync_catalog_to_supabase()
 
 
-def run_scheduler_in_thread():
-    try:
-        run_scheduler()
-    except Exception as e:
-        print("Error en scheduler:", str(e))
+async def start_background_jobs():
+    print("Iniciando aplicación...")
+
+    if not SUPABASE_URL or not SUPABASE_KEY:
+        print("Supabase no configurado - Solo búsqueda disponible.")
+        return
+    if not RUN_BACKGROUND_JOBS:
+        print("Sincronizacion deshabilitada en este proceso (definir RUN_BACKGROUND_JOBS=1).")
+        return
 
+    _background_tasks.append(asyncio.create_task(_periodic_sync()))
 
-print("Iniciando aplicación...")
 
-if SUPABASE_URL and SUPABASE_KEY:
-    Thread(target=run_sync_in_thread).start()
-    Thread(target=run_scheduler_in_thread, daemon=True).start()
-else:
-    print("Supabase no configurado - Solo búsqueda disponible.")
+async def stop_background_jobs():
+    for task in _background_tasks:
+        task.cancel()
+    _background_tasks.clear()
 
 
 # ==============================================================
@@ -251,5 +655,5 @@ else:
 # ==============================================================
 
 if __name__ == "__main__":
-    # En Render / Gunicorn no se usa esto; lo maneja la plataforma.
-    app.run(host="0.0.0.0", port=5000)
+    # En Render / Uvicorn no se usa esto; lo maneja la plataforma.
+    uvicorn.run(app, host="0.0.0.0", port=5000)
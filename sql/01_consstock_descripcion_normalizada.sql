@@ -0,0 +1,20 @@
+-- Descripción normalizada calculada y persistida en SQL Server.
+-- Equivale a normalize_text() de app.py: minúsculas, sin acentos (á é í ó ú ñ ü)
+-- y tab, LF, VT, FF, CR y espacio duro (NBSP) colapsados a un único espacio.
+-- (El \s de Python también cubre otros espacios Unicode poco comunes que acá no.)
+-- Correr una vez sobre la base antes de desplegar la versión que la lee.
+
+ALTER TABLE dbo.ConsStock ADD descripcion_normalizada AS
+    LTRIM(RTRIM(
+        -- Colapsa espacios repetidos: ' ' -> ' ' + CHAR(7), quita CHAR(7) + ' ', quita CHAR(7)
+        REPLACE(REPLACE(REPLACE(
+            REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(
+                REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(REPLACE(
+                    LOWER(Descri) COLLATE Latin1_General_BIN2,
+                    N'á', N'a'), N'é', N'e'), N'í', N'i'), N'ó', N'o'),
+                    N'ú', N'u'), N'ñ', N'n'), N'ü', N'u'),
+                NCHAR(9), N' '), NCHAR(10), N' '), NCHAR(11), N' '),
+                NCHAR(12), N' '), NCHAR(13), N' '), NCHAR(160), N' '),
+            N' ', N' ' + CHAR(7)), CHAR(7) + N' ', N''), CHAR(7), N'')
+    )) PERSISTED;
+GO
@@ -0,0 +1,7 @@
+-- Columna rowversion para la sincronización incremental hacia Supabase.
+-- SQL Server la actualiza sola en cada INSERT/UPDATE de la fila; app.py lee
+-- sólo las filas con RV >= a la marca guardada en sync_state (Supabase).
+-- Correr una vez sobre la base antes de desplegar la versión que la lee.
+
+ALTER TABLE dbo.ConsStock ADD RV rowversion;
+GO
@@ -0,0 +1,16 @@
+-- Índice full-text sobre Descri para /search-multi (CONTAINS con prefijos
+-- en lugar de LIKE '%term%', que obliga a recorrer toda la tabla).
+-- Requiere Full-Text Search instalado (en Express: "with Advanced Services").
+-- KEY INDEX debe ser un índice único de una sola columna (la PK de ConsStock).
+-- Sin stoplist: con la del sistema, palabras como 'para', 'con' o 'los' no se
+-- indexan y un CONTAINS que las incluye no devuelve filas (LIKE no filtraba nada).
+-- Si el índice ya existe: ALTER FULLTEXT INDEX ON dbo.ConsStock SET STOPLIST = OFF;
+
+CREATE FULLTEXT CATALOG ftCatalogo WITH ACCENT_SENSITIVITY = OFF;
+GO
+
+CREATE FULLTEXT INDEX ON dbo.ConsStock (Descri LANGUAGE 3082)
+    KEY INDEX PK_ConsStock
+    ON ftCatalogo
+    WITH (CHANGE_TRACKING = AUTO, STOPLIST = OFF);
+GO
@@ -0,0 +1,11 @@
+-- Índice filtrado y cubriente para las consultas de sincronización de app.py
+-- (SYNC_QUERY y SYNC_CODES_QUERY). El filtro coincide con el WHERE y la
+-- clave con el ORDER BY: SQL Server devuelve las filas ya ordenadas, sin
+-- sort ni key lookups. Verificar con SET STATISTICS IO, TIME ON.
+-- Requiere las columnas de 01_ y 02_.
+
+CREATE NONCLUSTERED INDEX IX_ConsStock_Sync
+    ON dbo.ConsStock (Codigo)
+    INCLUDE (Descri, descripcion_normalizada, PrecioFinal, RV)
+    WHERE PrecioFinal > 0;
+GO
@@ -0,0 +1,9 @@
+-- Estado de la sincronización SQL Server -> Supabase (correr en Supabase).
+-- last_rv guarda MIN_ACTIVE_ROWVERSION() de la última corrida exitosa.
+-- Para forzar una sincronización completa, borrar la fila correspondiente.
+
+create table if not exists public.sync_state (
+    id          text primary key,
+    last_rv     bigint not null default 0,
+    updated_at  timestamp
+);
@@ -0,0 +1,113 @@
+"""Entorno de tests: pyodbc falso sobre una tabla en memoria y variables mínimas.
+
+app.py lee la configuración y abre el pool al importarse, así que el módulo
+falso y las variables de entorno tienen que estar listos antes del import.
+"""
+import os
+import sys
+import types
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ.update({
+    'SQLSERVER_HOST': 'test',
+    'SQLSERVER_DB': 'test',
+    'SQLSERVER_USER': 'test',
+    'SQLSERVER_PASS': 'test',
+    'API_TOKEN': 'token',
+})
+
+
+class FakeConsStock:
+    """dbo.ConsStock en memoria, con rowversion automática por fila."""
+
+    def __init__(self):
+        self.rows = {}
+        self.rv = 0
+
+    def upsert(self, codigo, descri, precio):
+        self.rv += 1
+        self.rows[codigo] = {
+            'Codigo': codigo,
+            'Descri': descri,
+            'descripcion_normalizada': ' '.join(descri.lower().split()),
+            'PrecioFinal': float(precio),
+            'RV': self.rv,
+        }
+
+    def delete(self, codigo):
+        del self.rows[codigo]
+
+    def active(self):
+        return sorted((r for r in self.rows.values() if r['PrecioFinal'] > 0), key=lambda r: r['Codigo'])
+
+
+def _product_tuple(row):
+    return row['Codigo'], row['Descri'], row['descripcion_normalizada'], row['PrecioFinal']
+
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self.arraysize = 1
+        self._result = []
+
+    def execute(self, query, *params):
+        import app
+        if query == app.SYNC_MARK_QUERY:
+            # Sin transacciones abiertas MIN_ACTIVE_ROWVERSION es @@DBTS + 1
+            self._result = [(self.db.rv + 1,)]
+        elif query == app.SYNC_QUERY:
+            (last_rv,) = params
+            self._result = [_product_tuple(r) for r in self.db.active() if r['RV'] >= last_rv]
+        elif query == app.SYNC_CODES_QUERY:
+            self._result = [(r['Codigo'],) for r in self.db.active()]
+        elif 'WHERE Codigo IN' in query:
+            codes = set(params)
+            self._result = [_product_tuple(r) for r in self.db.active() if r['Codigo'] in codes]
+        else:
+            raise AssertionError(f"Consulta inesperada: {query}")
+        return self
+
+    def fetchmany(self, size):
+        rows, self._result = self._result[:size], self._result[size:]
+        return rows
+
+    def fetchall(self):
+        return self.fetchmany(len(self._result))
+
+    def fetchval(self):
+        return self._result[0][0]
+
+
+class FakeConnection:
+    def __init__(self, db):
+        self.db = db
+
+    def cursor(self):
+        return FakeCursor(self.db)
+
+    def close(self):
+        pass
+
+
+class _FakeError(Exception):
+    pass
+
+
+_fake_pyodbc = types.ModuleType('pyodbc')
+_fake_pyodbc.Error = _FakeError
+_fake_pyodbc.OperationalError = type('OperationalError', (_FakeError,), {})
+_fake_pyodbc.db = FakeConsStock()
+_fake_pyodbc.connect = lambda *args, **kwargs: FakeConnection(_fake_pyodbc.db)
+sys.modules['pyodbc'] = _fake_pyodbc
+
+
+@pytest.fixture
+def consstock():
+    """Tabla ConsStock vacía para cada test."""
+    _fake_pyodbc.db = FakeConsStock()
+    return _fake_pyodbc.db
@@ -0,0 +1,202 @@
+"""Tests de la sincronización incremental y del armado de la búsqueda.
+
+Supabase se reemplaza por un servidor aiohttp que imita lo que usa app.py de
+PostgREST (upsert, filtros in.(), paginado limit/offset y sync_state).
+"""
+import asyncio
+import re
+
+import orjson
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+import app
+
+
+_QUOTED_RE = re.compile(r'"((?:[^"\\]|\\.)*)"')
+
+
+class FakePostgrest:
+    """Tablas productos_catalogo y sync_state de Supabase en memoria."""
+
+    def __init__(self, max_rows=None):
+        self.productos = {}
+        self.last_rv = None
+        self.max_rows = max_rows
+        self.upserted = []
+
+    def web_app(self):
+        web_app = web.Application()
+        web_app.router.add_get('/rest/v1/productos_catalogo', self.get_productos)
+        web_app.router.add_post('/rest/v1/productos_catalogo', self.post_productos)
+        web_app.router.add_delete('/rest/v1/productos_catalogo', self.delete_productos)
+        web_app.router.add_get('/rest/v1/sync_state', self.get_state)
+        web_app.router.add_post('/rest/v1/sync_state', self.post_state)
+        return web_app
+
+    async def get_productos(self, request):
+        limit = int(request.query['limit'])
+        if self.max_rows:
+            limit = min(limit, self.max_rows)
+        offset = int(request.query['offset'])
+        codes = sorted(self.productos)[offset:offset + limit]
+        return web.json_response([{'codigo': c} for c in codes])
+
+    async def post_productos(self, request):
+        assert request.query['on_conflict'] == 'codigo'
+        rows = orjson.loads(await request.read())
+        for row in rows:
+            self.productos[row['codigo']] = row
+        self.upserted.extend(row['codigo'] for row in rows)
+        return web.Response(status=201)
+
+    async def delete_productos(self, request):
+        value = request.query['codigo']
+        assert value.startswith('in.(') and value.endswith(')')
+        for code in _QUOTED_RE.findall(value):
+            self.productos.pop(re.sub(r'\\(.)', r'\1', code), None)
+        return web.Response(status=204)
+
+    async def get_state(self, request):
+        assert request.query['id'] == f'eq.{app.SYNC_STATE_ID}'
+        rows = [] if self.last_rv is None else [{'last_rv': self.last_rv}]
+        return web.json_response(rows)
+
+    async def post_state(self, request):
+        state = orjson.loads(await request.read())
+        assert state['id'] == app.SYNC_STATE_ID
+        self.last_rv = state['last_rv']
+        return web.Response(status=201)
+
+
+@pytest.fixture
+def supabase(monkeypatch):
+    monkeypatch.setattr(app, 'SUPABASE_KEY', 'key')
+    monkeypatch.setattr(app, 'RETRY_BACKOFF', 0)
+    return FakePostgrest()
+
+
+def run_sync(monkeypatch, supabase):
+    """Corre una sincronización completa contra el servidor falso."""
+    async def main():
+        server = TestServer(supabase.web_app())
+        await server.start_server()
+        monkeypatch.setattr(app, 'SUPABASE_URL', str(server.make_url('')).rstrip('/'))
+        try:
+            return await app.sync_catalog_to_supabase()
+        finally:
+            await server.close()
+
+    supabase.upserted = []
+    return asyncio.run(main())
+
+
+def fill(consstock, count):
+    for i in range(count):
+        consstock.upsert(f'P{i:03}', f'Producto  {i}', 10 + i)
+
+
+def test_full_sync(monkeypatch, consstock, supabase):
+    fill(consstock, 5)
+    consstock.upsert('SINPRECIO', 'Sin precio', 0)
+
+    assert run_sync(monkeypatch, supabase) is True
+
+    assert sorted(supabase.productos) == [f'P{i:03}' for i in range(5)]
+    row = supabase.productos['P002']
+    assert row['descripcion'] == 'Producto  2'
+    assert row['descripcion_normalizada'] == 'producto 2'
+    assert row['precio_final'] == 12.0
+    assert supabase.last_rv == consstock.rv + 1
+
+
+def test_incremental_sync_only_sends_changed_rows(monkeypatch, consstock, supabase):
+    fill(consstock, 5)
+    run_sync(monkeypatch, supabase)
+
+    consstock.upsert('P001', 'Producto 1 nuevo', 99)
+    consstock.upsert('P100', 'Producto 100', 5)
+
+    assert run_sync(monkeypatch, supabase) is True
+    assert sorted(supabase.upserted) == ['P001', 'P100']
+    assert supabase.productos['P001']['precio_final'] == 99.0
+    assert supabase.last_rv == consstock.rv + 1
+
+    # Sin cambios no se sube nada
+    assert run_sync(monkeypatch, supabase) is True
+    assert supabase.upserted == []
+
+
+def test_sync_deletes_stale_codes(monkeypatch, consstock, supabase):
+    fill(consstock, 20)
+    consstock.upsert('P"1\\', 'Codigo con comillas', 1)
+    run_sync(monkeypatch, supabase)
+
+    consstock.delete('P003')
+    consstock.delete('P"1\\')
+    consstock.upsert('P005', 'Producto 5', 0)
+
+    assert run_sync(monkeypatch, supabase) is True
+    assert sorted(supabase.productos) == [f'P{i:03}' for i in range(20) if i not in (3, 5)]
+
+
+def test_sync_reuploads_missing_codes(monkeypatch, consstock, supabase):
+    fill(consstock, 5)
+    run_sync(monkeypatch, supabase)
+
+    # Filas que faltan en Supabase sin haber cambiado en SQL Server
+    del supabase.productos['P001']
+    del supabase.productos['P004']
+
+    assert run_sync(monkeypatch, supabase) is True
+    assert sorted(supabase.upserted) == ['P001', 'P004']
+    assert sorted(supabase.productos) == [f'P{i:03}' for i in range(5)]
+
+
+def test_sync_guard_skips_large_delete_but_saves_mark(monkeypatch, consstock, supabase):
+    fill(consstock, 10)
+    run_sync(monkeypatch, supabase)
+
+    for i in range(5):
+        consstock.delete(f'P{i:03}')
+    consstock.upsert('P009', 'Producto 9 nuevo', 50)
+
+    assert run_sync(monkeypatch, supabase) is False
+    assert len(supabase.productos) == 10
+    assert supabase.productos['P009']['precio_final'] == 50.0
+    assert supabase.last_rv == consstock.rv + 1
+
+    monkeypatch.setattr(app, 'MAX_STALE_FRACTION', 1)
+    assert run_sync(monkeypatch, supabase) is True
+    assert supabase.upserted == []
+    assert sorted(supabase.productos) == [f'P{i:03}' for i in range(5, 10)]
+
+
+def test_sync_pages_remote_codes_below_max_rows(monkeypatch, consstock, supabase):
+    monkeypatch.setattr(app, 'BATCH_SIZE', 4)
+    supabase.max_rows = 3
+    fill(consstock, 10)
+    run_sync(monkeypatch, supabase)
+
+    assert run_sync(monkeypatch, supabase) is True
+    assert supabase.upserted == []
+    assert len(supabase.productos) == 10
+
+
+def test_search_condition_uses_contains_for_plain_words():
+    condition, params = app._search_condition(('cano', 'codo  pvc'))
+    assert condition == 'CONTAINS(Descri, ?)'
+    assert params == ['"cano*" OR "codo pvc*"']
+
+
+def test_search_condition_uses_like_for_other_terms():
+    condition, params = app._search_condition(('3/4', 'ab', 'perfil-c', 'tubo'))
+    assert condition == 'CONTAINS(Descri, ?) OR Descri LIKE ? OR Descri LIKE ? OR Descri LIKE ?'
+    assert params == ['"tubo*"', '%3/4%', '%ab%', '%perfil-c%']
+
+
+def test_search_condition_without_fulltext_terms():
+    condition, params = app._search_condition(('1/2',))
+    assert condition == 'Descri LIKE ?'
+    assert params == ['%1/2%']